@@ -7,46 +7,26 @@ from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel, Field
+from dataclasses import dataclass, fields
+from contextlib import asynccontextmanager
 from typing import Optional, List, Dict, Any, Literal
-from collections import deque
+from collections import deque, OrderedDict
 import os
 import time
-import json
-import csv
-import io
+import tempfile
+import random
+import importlib.util
+import orjson
 from datetime import datetime
 from pathlib import Path
 from dotenv import load_dotenv, find_dotenv
 load_dotenv(find_dotenv())
 
-# Minimal observability via Arize/OpenInference (optional)
+# On-disk cache tier (optional; falls back to in-memory only)
 try:
-    from arize.otel import register
-    from openinference.instrumentation.langchain import LangChainInstrumentor
-    from openinference.instrumentation.litellm import LiteLLMInstrumentor
-    from openinference.instrumentation import using_prompt_template, using_metadata, using_attributes
-    from opentelemetry import trace
-    _TRACING = True
-except Exception:
-    def using_prompt_template(**kwargs):  # type: ignore
-        from contextlib import contextmanager
-        @contextmanager
-        def _noop():
-            yield
-        return _noop()
-    def using_metadata(*args, **kwargs):  # type: ignore
-        from contextlib import contextmanager
-        @contextmanager
-        def _noop():
-            yield
-        return _noop()
-    def using_attributes(*args, **kwargs):  # type: ignore
-        from contextlib import contextmanager
-        @contextmanager
-        def _noop():
-            yield
-        return _noop()
-    _TRACING = False
+    import diskcache
+except ImportError:
+    diskcache = None
 
 # LangGraph + LangChain
 from langgraph.graph import StateGraph, END, START
@@ -54,9 +34,9 @@ from typing_extensions import TypedDict, Annotated
 import operator
 from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
 from langchain_core.tools import tool
-from langchain_openai import ChatOpenAI
 import httpx
 import asyncio
+import numpy as np
 
 
 # =============================================================================
@@ -116,6 +96,25 @@ class GeneComparison(BaseModel):
     status: Literal["retained", "changed", "missing"]
 
 
+@dataclass(slots=True)
+class GeneComparisonRaw:
+    """Unvalidated internal form of GeneComparison used while comparing genes"""
+    gene_symbol: str
+    confidence: str
+    symbol_retained: bool
+    location_changed: bool
+    ensembl_id_retained: bool
+    current_version: Optional[GenomicLocation] = None
+    current_ensembl_version: Optional[str] = None
+    target_version: Optional[GenomicLocation] = None
+    target_ensembl_version: Optional[int] = None
+    status: str = "missing"
+    
+    def to_model(self) -> GeneComparison:
+        """Convert to the response model without re-validating"""
+        return GeneComparison.model_construct(**{f.name: getattr(self, f.name) for f in fields(self)})
+
+
 class AnalysisSummary(BaseModel):
     """Summary statistics for panel analysis"""
     symbols_retained: int
@@ -134,6 +133,29 @@ class PanelAnalysisResponse(BaseModel):
     genes: List[GeneComparison]
 
 
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+# Maximum symbols accepted by Ensembl's POST /lookup/symbol endpoint
+ENSEMBL_BATCH_SIZE = 1000
+
+# Maximum queries accepted by a single MyGene.info batch request
+MYGENE_BATCH_SIZE = 1000
+
+# Maximum in-flight per-gene Ensembl requests (matches the 15 req/s limit)
+ENSEMBL_MAX_CONCURRENCY = 15
+
+# Route lookups for the current Ensembl release through MyGene.info, which is
+# much faster than Ensembl REST but only serves current annotations
+USE_MYGENE = os.getenv("USE_MYGENE", "").lower() in ("1", "true", "yes")
+CURRENT_ENSEMBL_VERSION = int(os.getenv("CURRENT_ENSEMBL_VERSION", "0")) or None
+
+# The direct async pipeline serves requests by default; set USE_LANGGRAPH to
+# route them through the LangGraph workflow instead (e.g. for agent tracing)
+USE_LANGGRAPH = os.getenv("USE_LANGGRAPH", "").lower() in ("1", "true", "yes")
+
+
 # =============================================================================
 # RATE LIMITER
 # =============================================================================
@@ -145,33 +167,210 @@ class RateLimiter:
         self.max_calls = max_calls
         self.window_seconds = window_seconds
         self.calls: deque = deque()
+        self._lock = asyncio.Lock()
+    
+    async def acquire(self):
+        """Wait without blocking the event loop if rate limit would be exceeded"""
+        async with self._lock:
+            now = time.monotonic()
+            
+            # Remove calls outside the window
+            while self.calls and self.calls[0] <= now - self.window_seconds:
+                self.calls.popleft()
+            
+            # If at limit, wait for the oldest call to leave the window
+            if len(self.calls) >= self.max_calls:
+                sleep_time = self.window_seconds - (now - self.calls[0])
+                if sleep_time > 0:
+                    await asyncio.sleep(sleep_time)
+                now = time.monotonic()
+                self.calls.popleft()
+            
+            self.calls.append(now)
+
+
+# Global rate limiters. Each Ensembl host (release archive) enforces its own
+# limit, so Ensembl limiters are kept per base URL.
+panelapp_limiter = RateLimiter(max_calls=60, window_seconds=60)
+ensembl_limiters: Dict[str, RateLimiter] = {}
+
+
+def get_ensembl_limiter(base_url: str) -> RateLimiter:
+    """Return the rate limiter for an Ensembl host"""
+    limiter = ensembl_limiters.get(base_url)
+    if limiter is None:
+        limiter = ensembl_limiters[base_url] = RateLimiter(max_calls=15, window_seconds=1)
+    return limiter
+
+
+# =============================================================================
+# LOOKUP CACHE
+# =============================================================================
+
+CACHE_DIR = os.getenv("CACHE_DIR", os.path.join(tempfile.gettempdir(), "panelchecker_cache"))
+
+# Returned by LookupCache.get when a key is absent (None is a valid cached value)
+CACHE_MISS = object()
+
+
+class LookupCache:
+    """Two-tier cache for API lookups: in-memory LRU backed by an optional disk cache"""
+    
+    def __init__(self, name: str, maxsize: int, ttl_seconds: Optional[int] = None):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._memory: OrderedDict = OrderedDict()
+        self._disk = None
+        
+        if diskcache is not None:
+            try:
+                self._disk = diskcache.Cache(os.path.join(CACHE_DIR, name))
+            except Exception as e:
+                print(f"Disk cache '{name}' unavailable, using memory only: {e}")
     
-    def wait_if_needed(self):
-        """Block if rate limit would be exceeded"""
-        now = time.time()
+    def get(self, key: Any) -> Any:
+        """Return the cached value for key, or CACHE_MISS"""
+        entry = self._memory.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at is None or expires_at > time.time():
+                self._memory.move_to_end(key)
+                return value
+            del self._memory[key]
         
-        # Remove calls outside the window
-        while self.calls and self.calls[0] < now - self.window_seconds:
-            self.calls.popleft()
+        if self._disk is not None:
+            # Keep the disk entry's remaining lifetime rather than restarting the TTL
+            value, expires_at = self._disk.get(key, default=CACHE_MISS, expire_time=True)
+            if value is not CACHE_MISS:
+                self._remember(key, value, expires_at)
+            return value
         
-        # If at limit, wait
-        if len(self.calls) >= self.max_calls:
-            sleep_time = self.window_seconds - (now - self.calls[0])
-            if sleep_time > 0:
-                time.sleep(sleep_time)
+        return CACHE_MISS
+    
+    def set(self, key: Any, value: Any):
+        """Store value in both tiers"""
+        expires_at = time.time() + self.ttl_seconds if self.ttl_seconds else None
+        self._remember(key, value, expires_at)
+        if self._disk is not None:
+            self._disk.set(key, value, expire=self.ttl_seconds)
+    
+    def _remember(self, key: Any, value: Any, expires_at: Optional[float]):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+
+# Ensembl release data is immutable per version, so entries never expire.
+# Values are GenomicLocation dicts, or None for genes the release lacks.
+ensembl_cache = LookupCache("ensembl", maxsize=50_000)
+
+# Signed-off panel versions are stable, but panels are re-released over time
+panelapp_cache = LookupCache("panelapp", maxsize=256, ttl_seconds=24 * 60 * 60)
+
+
+# =============================================================================
+# SHARED HTTP CLIENTS
+# =============================================================================
+
+# One pooled client per host so repeated lookups reuse keep-alive connections
+# instead of paying a TCP+TLS handshake per request
+_http_clients: Dict[str, httpx.AsyncClient] = {}
+
+# HTTP/2 multiplexes concurrent lookups over a few connections; it needs the
+# optional h2 package (httpx[http2]), otherwise fall back to HTTP/1.1 pooling
+HTTP2_ENABLED = importlib.util.find_spec("h2") is not None
+if HTTP2_ENABLED:
+    HTTP_LIMITS = httpx.Limits(max_connections=10, max_keepalive_connections=10)
+else:
+    HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=64)
+
+
+def get_http_client(base_url: str, headers: Optional[Dict[str, str]] = None) -> httpx.AsyncClient:
+    """Return the shared AsyncClient for a base URL, creating it on first use"""
+    client = _http_clients.get(base_url)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            http2=HTTP2_ENABLED,
+            limits=HTTP_LIMITS,
+            timeout=30.0
+        )
+        _http_clients[base_url] = client
+    return client
+
+
+# Retry policy for transient API failures (rate limiting and server errors)
+RETRY_ATTEMPTS = 4
+RETRY_BACKOFF_SECONDS = 0.5
+RETRY_MAX_WAIT_SECONDS = 8.0
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def _retry_delay(attempt: int, response: Optional[httpx.Response]) -> float:
+    """Seconds to wait before retry number `attempt` (0-based)"""
+    # Honour the server's Retry-After on 429s
+    if response is not None and response.status_code == 429:
+        retry_after = response.headers.get("Retry-After")
+        try:
+            return min(float(retry_after), 60.0)
+        except (TypeError, ValueError):
+            pass
+    
+    # Exponential backoff with full jitter
+    return random.uniform(0, min(RETRY_MAX_WAIT_SECONDS, RETRY_BACKOFF_SECONDS * 2 ** attempt))
+
+
+async def send_with_retry(
+    client: httpx.AsyncClient,
+    method: str,
+    url: str,
+    limiter: Optional[RateLimiter] = None,
+    **kwargs
+) -> httpx.Response:
+    """Send a request, retrying 429/5xx responses and transport errors with backoff
+    
+    The limiter (if given) is acquired before every attempt, so retries count
+    against the host's rate limit too.
+    """
+    for attempt in range(RETRY_ATTEMPTS):
+        last_attempt = attempt == RETRY_ATTEMPTS - 1
+        if limiter is not None:
+            await limiter.acquire()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.TransportError:
+            if last_attempt:
+                raise
+            await asyncio.sleep(_retry_delay(attempt, None))
+            continue
         
-        self.calls.append(now)
+        if response.status_code not in RETRY_STATUS_CODES or last_attempt:
+            return response
+        await asyncio.sleep(_retry_delay(attempt, response))
 
 
-# Global rate limiters
-panelapp_limiter = RateLimiter(max_calls=60, window_seconds=60)
-ensembl_limiter = RateLimiter(max_calls=15, window_seconds=1)
+async def close_http_clients():
+    """Close all shared HTTP clients"""
+    clients = list(_http_clients.values())
+    _http_clients.clear()
+    for client in clients:
+        await client.aclose()
 
 
 # =============================================================================
 # API CLIENTS
 # =============================================================================
 
+def is_signed_off_panel(panel_data: Dict[str, Any]) -> bool:
+    """Check if panel is signed off by looking at types array"""
+    return any(
+        panel_type.get("slug") == "gms-signed-off" 
+        for panel_type in panel_data.get("types", [])
+    )
+
+
 class PanelAppClient:
     """Client for PanelApp API"""
     
@@ -183,60 +382,45 @@ class PanelAppClient:
     
     async def search_panels(self, search: Optional[str] = None, signed_off_only: bool = True) -> List[PanelInfo]:
         """Search for panels"""
-        panelapp_limiter.wait_if_needed()
+        await panelapp_limiter.acquire()
         
         params = {}
         if search:
             params["search"] = search
         
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.BASE_URL}/panels/",
-                headers=self.HEADERS,
-                params=params,
-                timeout=30.0
+        client = get_http_client(self.BASE_URL, self.HEADERS)
+        response = await client.get("/panels/", params=params)
+        response.raise_for_status()
+        data = orjson.loads(response.content)
+        
+        # Filter for signed off versions if requested
+        return [
+            PanelInfo(
+                id=str(panel_data["id"]),
+                name=panel_data["name"],
+                version=str(panel_data["version"]),
+                gene_count=panel_data.get("stats", {}).get("number_of_genes", 0),
+                signed_off=is_signed_off
             )
-            response.raise_for_status()
-            data = response.json()
-            
-            panels = []
-            for panel_data in data.get("results", []):
-                # Check if panel is signed off by looking at types array
-                is_signed_off = any(
-                    panel_type.get("slug") == "gms-signed-off" 
-                    for panel_type in panel_data.get("types", [])
-                )
-                
-                # Filter for signed off versions if requested
-                if signed_off_only and not is_signed_off:
-                    continue
-                
-                # Get gene count from stats
-                stats = panel_data.get("stats", {})
-                gene_count = stats.get("number_of_genes", 0)
-                
-                panels.append(PanelInfo(
-                    id=str(panel_data["id"]),
-                    name=panel_data["name"],
-                    version=str(panel_data["version"]),
-                    gene_count=gene_count,
-                    signed_off=is_signed_off
-                ))
-            
-            return panels
+            for panel_data in data.get("results", [])
+            if (is_signed_off := is_signed_off_panel(panel_data)) or not signed_off_only
+        ]
     
     async def get_panel_genes(self, panel_id: str) -> Dict[str, Any]:
         """Get genes for a specific panel"""
-        panelapp_limiter.wait_if_needed()
+        cached = panelapp_cache.get(panel_id)
+        if cached is not CACHE_MISS:
+            return cached
         
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.BASE_URL}/panels/{panel_id}/",
-                headers=self.HEADERS,
-                timeout=30.0
-            )
-            response.raise_for_status()
-            return response.json()
+        await panelapp_limiter.acquire()
+        
+        client = get_http_client(self.BASE_URL, self.HEADERS)
+        response = await client.get(f"/panels/{panel_id}/")
+        response.raise_for_status()
+        data = orjson.loads(response.content)
+        
+        panelapp_cache.set(panel_id, data)
+        return data
 
 
 class EnsemblClient:
@@ -264,34 +448,54 @@ class EnsemblClient:
         else:
             self.base_url = "https://rest.ensembl.org"
         
-        self.headers = {
-            "Content-Type": "application/json"
-        }
+        # Only archived releases are immutable; the unversioned host moves on each release
+        self.cacheable = version is not None
+        
+        # Response format is requested via the content-type query parameter
+        # on GETs, so no per-request headers are needed
+        self.headers = {}
+    
+    def _cached_location(self, symbol: str) -> Any:
+        """Return the cached location for symbol, or CACHE_MISS"""
+        if not self.cacheable:
+            return CACHE_MISS
+        cached = ensembl_cache.get((self.base_url, symbol))
+        if cached is CACHE_MISS or cached is None:
+            return cached
+        return GenomicLocation.model_construct(**cached)
+    
+    def _cache_location(self, symbol: str, location: Optional[GenomicLocation]):
+        if self.cacheable:
+            ensembl_cache.set((self.base_url, symbol), location.model_dump() if location else None)
     
     async def lookup_gene_by_symbol(self, symbol: str) -> Optional[GenomicLocation]:
         """Look up gene by symbol"""
-        ensembl_limiter.wait_if_needed()
+        cached = self._cached_location(symbol)
+        if cached is not CACHE_MISS:
+            return cached
         
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/lookup/symbol/homo_sapiens/{symbol}",
-                    headers=self.headers,
-                    params={"expand": "1"},
-                    timeout=10.0
-                )
-                
-                if response.status_code == 404:
-                    return None
-                
-                response.raise_for_status()
-                data = response.json()
-                
-                # Validate GRCh38 assembly
-                if data.get("assembly_name") != "GRCh38":
-                    return None
-                
-                return GenomicLocation(
+            client = get_http_client(self.base_url, self.headers)
+            response = await send_with_retry(
+                client,
+                "GET",
+                f"/lookup/symbol/homo_sapiens/{symbol}",
+                limiter=get_ensembl_limiter(self.base_url),
+                params={"expand": "1", "content-type": "application/json"},
+                timeout=10.0
+            )
+            
+            if response.status_code == 404:
+                self._cache_location(symbol, None)
+                return None
+            
+            response.raise_for_status()
+            data = orjson.loads(response.content)
+            
+            # Validate GRCh38 assembly
+            location = None
+            if data.get("assembly_name") == "GRCh38":
+                location = GenomicLocation.model_construct(
                     ensembl_id=data["id"],
                     gene_symbol=data.get("display_name", symbol),
                     chromosome=data["seq_region_name"],
@@ -299,78 +503,207 @@ class EnsemblClient:
                     end=data["end"],
                     strand=data["strand"]
                 )
+            
+            self._cache_location(symbol, location)
+            return location
         except Exception as e:
             print(f"Error looking up gene {symbol}: {e}")
             return None
     
     async def lookup_gene_by_id(self, ensembl_id: str) -> Optional[GenomicLocation]:
         """Look up gene by Ensembl ID"""
-        ensembl_limiter.wait_if_needed()
-        
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/lookup/id/{ensembl_id}",
-                    headers=self.headers,
-                    timeout=10.0
+            client = get_http_client(self.base_url, self.headers)
+            response = await send_with_retry(
+                client,
+                "GET",
+                f"/lookup/id/{ensembl_id}",
+                limiter=get_ensembl_limiter(self.base_url),
+                params={"content-type": "application/json"},
+                timeout=10.0
+            )
+            
+            if response.status_code == 404:
+                return None
+            
+            response.raise_for_status()
+            data = orjson.loads(response.content)
+            
+            # Validate GRCh38 assembly
+            if data.get("assembly_name") != "GRCh38":
+                return None
+            
+            return GenomicLocation.model_construct(
+                ensembl_id=data["id"],
+                gene_symbol=data.get("display_name", ""),
+                chromosome=data["seq_region_name"],
+                start=data["start"],
+                end=data["end"],
+                strand=data["strand"]
+            )
+        except Exception as e:
+            print(f"Error looking up gene ID {ensembl_id}: {e}")
+            return None
+    
+    async def lookup_symbols_batch(self, symbols: List[str]) -> Dict[str, Optional[GenomicLocation]]:
+        """Look up many genes by symbol using the batched POST endpoint"""
+        results: Dict[str, Optional[GenomicLocation]] = {}
+        uncached = []
+        for symbol in dict.fromkeys(symbols):
+            cached = self._cached_location(symbol)
+            if cached is CACHE_MISS:
+                results[symbol] = None
+                uncached.append(symbol)
+            else:
+                results[symbol] = cached
+        
+        client = get_http_client(self.base_url, self.headers)
+        
+        for i in range(0, len(uncached), ENSEMBL_BATCH_SIZE):
+            chunk = uncached[i:i + ENSEMBL_BATCH_SIZE]
+            try:
+                response = await send_with_retry(
+                    client,
+                    "POST",
+                    "/lookup/symbol/homo_sapiens",
+                    limiter=get_ensembl_limiter(self.base_url),
+                    json={"symbols": chunk},
+                    headers={"Accept": "application/json"}
                 )
                 
-                if response.status_code == 404:
-                    return None
+                # A non-retryable 4xx suggests a bad symbol in the body, so
+                # resolve the chunk one gene at a time instead
+                if 400 <= response.status_code < 500 and response.status_code not in RETRY_STATUS_CODES:
+                    print(f"Batch lookup of {len(chunk)} genes rejected ({response.status_code}), falling back to per-gene lookups")
+                    results.update(await self.lookup_symbols_concurrently(chunk))
+                    continue
                 
                 response.raise_for_status()
-                data = response.json()
-                
-                # Validate GRCh38 assembly
-                if data.get("assembly_name") != "GRCh38":
-                    return None
-                
-                return GenomicLocation(
-                    ensembl_id=data["id"],
-                    gene_symbol=data.get("display_name", ""),
-                    chromosome=data["seq_region_name"],
-                    start=data["start"],
-                    end=data["end"],
-                    strand=data["strand"]
+                data = orjson.loads(response.content)
+            except Exception as e:
+                # Host unreachable or retries exhausted: leave the chunk unresolved
+                # (and uncached) rather than multiplying the failed requests
+                print(f"Error in batch lookup of {len(chunk)} genes: {e}")
+                continue
+            
+            for symbol in chunk:
+                gene = data.get(symbol)
+                # Missing symbols come back absent or null; validate GRCh38 assembly
+                if gene and gene.get("assembly_name") == "GRCh38":
+                    results[symbol] = GenomicLocation.model_construct(
+                        ensembl_id=gene["id"],
+                        gene_symbol=gene.get("display_name", symbol),
+                        chromosome=gene["seq_region_name"],
+                        start=gene["start"],
+                        end=gene["end"],
+                        strand=gene["strand"]
+                    )
+                self._cache_location(symbol, results[symbol])
+        
+        return results
+    
+    async def lookup_symbols_concurrently(self, symbols: List[str]) -> Dict[str, Optional[GenomicLocation]]:
+        """Look up genes one symbol at a time, running the requests concurrently"""
+        sem = asyncio.Semaphore(ENSEMBL_MAX_CONCURRENCY)
+        results = await asyncio.gather(*[_bounded_lookup(sem, self, symbol) for symbol in symbols])
+        return dict(results)
+
+
+class MyGeneClient:
+    """Client for MyGene.info gene query API"""
+    
+    BASE_URL = "https://mygene.info/v3"
+    PRIMARY_CHROMOSOMES = {str(n) for n in range(1, 23)} | {"X", "Y", "MT"}
+    
+    def __init__(self, ensembl_version: Optional[int] = None):
+        """Initialize MyGene client
+        
+        Args:
+            ensembl_version: Ensembl release to fall back to if MyGene.info fails
+        """
+        self.fallback = EnsemblClient(version=ensembl_version)
+    
+    async def batch_positions(self, symbols: List[str]) -> Dict[str, Optional[GenomicLocation]]:
+        """Look up GRCh38 positions for many gene symbols"""
+        results: Dict[str, Optional[GenomicLocation]] = {symbol: None for symbol in symbols}
+        client = get_http_client(self.BASE_URL)
+        seen = set()
+        
+        for i in range(0, len(symbols), MYGENE_BATCH_SIZE):
+            chunk = symbols[i:i + MYGENE_BATCH_SIZE]
+            
+            try:
+                response = await send_with_retry(
+                    client,
+                    "POST",
+                    "/query",
+                    data={
+                        "q": ",".join(chunk),
+                        "scopes": "symbol",
+                        "species": "human",
+                        "fields": "symbol,ensembl.gene,genomic_pos"
+                    }
                 )
-        except Exception as e:
-            print(f"Error looking up gene ID {ensembl_id}: {e}")
+                response.raise_for_status()
+                hits = orjson.loads(response.content)
+            except Exception as e:
+                print(f"Error in MyGene lookup of {len(chunk)} genes, falling back to Ensembl: {e}")
+                results.update(await self.fallback.lookup_symbols_batch(chunk))
+                continue
+            
+            for hit in hits:
+                symbol = hit.get("query")
+                # Keep only the first hit for each symbol; later ones are
+                # lower-scoring and may be a different gene
+                if hit.get("notfound") or symbol not in results or symbol in seen:
+                    continue
+                seen.add(symbol)
+                results[symbol] = self._to_location(hit, symbol)
+        
+        return results
+    
+    def _to_location(self, hit: Dict[str, Any], symbol: str) -> Optional[GenomicLocation]:
+        """Pick the primary-assembly position from a MyGene hit"""
+        positions = hit.get("genomic_pos") or []
+        if isinstance(positions, dict):
+            positions = [positions]
+        
+        # genomic_pos also lists alternate haplotype/patch placements
+        primary = [pos for pos in positions if str(pos.get("chr")) in self.PRIMARY_CHROMOSOMES]
+        if not primary:
             return None
+        
+        pos = primary[0]
+        ensembl_id = pos.get("ensemblgene")
+        if not ensembl_id:
+            ensembl = hit.get("ensembl") or {}
+            if isinstance(ensembl, list):
+                ensembl = ensembl[0] if ensembl else {}
+            ensembl_id = ensembl.get("gene")
+        if not ensembl_id:
+            return None
+        
+        return GenomicLocation.model_construct(
+            ensembl_id=ensembl_id,
+            gene_symbol=hit.get("symbol", symbol),
+            chromosome=str(pos["chr"]),
+            start=pos["start"],
+            end=pos["end"],
+            strand=pos["strand"]
+        )
 
 
-# =============================================================================
-# LLM INITIALIZATION
-# =============================================================================
-
-def _init_llm():
-    """Initialize LLM for agent reasoning"""
-    class _Fake:
-        def __init__(self):
-            pass
-        def bind_tools(self, tools):
-            return self
-        def invoke(self, messages):
-            class _Msg:
-                content = "Analysis complete"
-                tool_calls: List[Dict[str, Any]] = []
-            return _Msg()
-
-    if os.getenv("TEST_MODE"):
-        return _Fake()
-    if os.getenv("OPENAI_API_KEY"):
-        return ChatOpenAI(model="gpt-3.5-turbo", temperature=0.7, max_tokens=1500)
-    elif os.getenv("OPENROUTER_API_KEY"):
-        return ChatOpenAI(
-            api_key=os.getenv("OPENROUTER_API_KEY"),
-            base_url="https://openrouter.ai/api/v1",
-            model=os.getenv("OPENROUTER_MODEL", "openai/gpt-4o-mini"),
-            temperature=0.7,
-        )
-    else:
-        raise ValueError("Please set OPENAI_API_KEY or OPENROUTER_API_KEY in your .env")
+async def fetch_target_locations(version: int, symbols: List[str]) -> Dict[str, Optional[GenomicLocation]]:
+    """Fetch target-version locations, using MyGene.info for the current release"""
+    if USE_MYGENE and version == CURRENT_ENSEMBL_VERSION:
+        return await MyGeneClient(ensembl_version=version).batch_positions(symbols)
+    return await EnsemblClient(version=version).lookup_symbols_batch(symbols)
 
 
-llm = _init_llm()
+async def _bounded_lookup(sem: asyncio.Semaphore, client: EnsemblClient, symbol: str):
+    """Run a single symbol lookup while holding a concurrency slot"""
+    async with sem:
+        return symbol, await client.lookup_gene_by_symbol(symbol)
 
 
 # =============================================================================
@@ -382,9 +715,11 @@ class PanelCheckState(TypedDict):
     messages: Annotated[List[BaseMessage], operator.add]
     panel_request: Dict[str, Any]
     panel_data: Optional[Dict[str, Any]]
+    genes: Optional[List[Dict[str, Any]]]
+    symbols: Optional[List[str]]
     current_ensembl_data: Optional[Dict[str, List[Optional[GenomicLocation]]]]
     target_ensembl_data: Optional[Dict[str, List[Optional[GenomicLocation]]]]
-    comparison_results: Optional[List[GeneComparison]]
+    comparison_results: Optional[List[GeneComparisonRaw]]
     final_report: Optional[str]
     tool_calls: Annotated[List[Dict[str, Any]], operator.add]
 
@@ -393,67 +728,66 @@ class PanelCheckState(TypedDict):
 # TOOLS & AGENTS
 # =============================================================================
 
-@tool
-async def fetch_panel_genes(panel_id: str) -> str:
-    """Fetch genes for a panel from PanelApp"""
+# Map PanelApp confidence levels to colors
+_CONF_MAP = {"3": "green", "2": "amber"}
+
+
+def parse_current_ensembl_data(gene_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Extract Ensembl reference data from PanelApp (GRCh38 only)"""
+    grch38_data = gene_data.get("ensembl_genes", {}).get("GRch38", {})
+    if not grch38_data:
+        return None
+    
+    # Use the first available version key (e.g., "90", "107", etc.)
+    version_key = next(iter(grch38_data))
+    version_data = grch38_data[version_key]
+    location_str = version_data.get("location", "")
+    
+    # Parse location string (format: "CHR:START-END")
+    if not (location_str and ":" in location_str and "-" in location_str):
+        return None
+    
+    chr_part, pos_part = location_str.split(":")
+    start, end = pos_part.split("-")
+    return {
+        "ensembl_id": version_data.get("ensembl_id", ""),
+        "gene_symbol": gene_data.get("gene_symbol", ""),
+        "chromosome": chr_part,
+        "start": int(start),
+        "end": int(end),
+        "strand": 1,  # PanelApp doesn't provide strand, default to 1
+        "version": version_key
+    }
+
+
+def _panel_gene_entry(gene: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the gene list entry for one PanelApp gene"""
+    gene_data = gene.get("gene_data", {})
+    return {
+        "symbol": gene_data.get("gene_symbol", ""),
+        "confidence": _CONF_MAP.get(gene.get("confidence_level", "3"), "red"),
+        "current_ensembl_data": parse_current_ensembl_data(gene_data)
+    }
+
+
+async def fetch_panel_genes_raw(panel_id: str) -> Dict[str, Any]:
+    """Fetch genes for a panel from PanelApp as native Python objects"""
     client = PanelAppClient()
     panel_data = await client.get_panel_genes(panel_id)
     
-    genes = panel_data.get("genes", [])
-    gene_list = []
-    for gene in genes:
-        confidence = gene.get("confidence_level", "3")
-        # Map confidence levels to colors
-        if confidence == "3":
-            color = "green"
-        elif confidence == "2":
-            color = "amber"
-        else:
-            color = "red"
-        
-        gene_data = gene.get("gene_data", {})
-        symbol = gene_data.get("gene_symbol", "")
-        
-        # Extract Ensembl reference data from PanelApp (GRCh38 only)
-        ensembl_genes = gene_data.get("ensembl_genes", {})
-        grch38_data = ensembl_genes.get("GRch38", {})
-        
-        # Get the first available version from GRch38 data
-        current_ensembl_data = None
-        if grch38_data:
-            # Get any version key (e.g., "90", "107", etc.)
-            version_keys = list(grch38_data.keys())
-            if version_keys:
-                version_key = version_keys[0]  # Use first available version
-                version_data = grch38_data[version_key]
-                location_str = version_data.get("location", "")
-                ensembl_id = version_data.get("ensembl_id", "")
-                
-                # Parse location string (format: "CHR:START-END")
-                if location_str and ":" in location_str and "-" in location_str:
-                    chr_part, pos_part = location_str.split(":")
-                    start, end = pos_part.split("-")
-                    current_ensembl_data = {
-                        "ensembl_id": ensembl_id,
-                        "gene_symbol": symbol,
-                        "chromosome": chr_part,
-                        "start": int(start),
-                        "end": int(end),
-                        "strand": 1,  # PanelApp doesn't provide strand, default to 1
-                        "version": version_key
-                    }
-        
-        gene_list.append({
-            "symbol": symbol,
-            "confidence": color,
-            "current_ensembl_data": current_ensembl_data
-        })
+    gene_list = [_panel_gene_entry(gene) for gene in panel_data.get("genes", [])]
     
-    return json.dumps({
+    return {
         "panel_name": panel_data.get("name", ""),
         "version": panel_data.get("version", ""),
         "genes": gene_list
-    })
+    }
+
+
+@tool
+async def fetch_panel_genes(panel_id: str) -> str:
+    """Fetch genes for a panel from PanelApp"""
+    return orjson.dumps(await fetch_panel_genes_raw(panel_id)).decode()
 
 
 @tool
@@ -463,9 +797,9 @@ async def fetch_ensembl_gene(gene_symbol: str, ensembl_version: int) -> str:
     gene_data = await client.lookup_gene_by_symbol(gene_symbol)
     
     if gene_data is None:
-        return json.dumps({"found": False, "gene_symbol": gene_symbol})
+        return orjson.dumps({"found": False, "gene_symbol": gene_symbol}).decode()
     
-    return json.dumps({
+    return orjson.dumps({
         "found": True,
         "ensembl_id": gene_data.ensembl_id,
         "gene_symbol": gene_data.gene_symbol,
@@ -473,7 +807,7 @@ async def fetch_ensembl_gene(gene_symbol: str, ensembl_version: int) -> str:
         "start": gene_data.start,
         "end": gene_data.end,
         "strand": gene_data.strand
-    })
+    }).decode()
 
 
 def compare_gene_data(
@@ -482,11 +816,11 @@ def compare_gene_data(
     confidence: str,
     current_version_str: Optional[str] = None,
     target_version_int: int = None
-) -> GeneComparison:
+) -> GeneComparisonRaw:
     """Compare gene data between versions"""
     if current is None and target is None:
         # Should not happen, but handle gracefully
-        return GeneComparison(
+        return GeneComparisonRaw(
             gene_symbol="UNKNOWN",
             confidence=confidence,
             symbol_retained=False,
@@ -499,7 +833,7 @@ def compare_gene_data(
     
     if current is None:
         # Gene only in target version (unusual)
-        return GeneComparison(
+        return GeneComparisonRaw(
             gene_symbol=target.gene_symbol,
             confidence=confidence,
             symbol_retained=False,
@@ -514,7 +848,7 @@ def compare_gene_data(
     
     if target is None:
         # Gene missing in target version
-        return GeneComparison(
+        return GeneComparisonRaw(
             gene_symbol=current.gene_symbol,
             confidence=confidence,
             symbol_retained=False,
@@ -542,7 +876,7 @@ def compare_gene_data(
     else:
         status = "changed"
     
-    return GeneComparison(
+    return GeneComparisonRaw(
         gene_symbol=current.gene_symbol,
         confidence=confidence,
         symbol_retained=symbol_retained,
@@ -556,6 +890,102 @@ def compare_gene_data(
     )
 
 
+def current_location_from_panel(ensembl_data: Optional[Dict[str, Any]]) -> Optional[GenomicLocation]:
+    """Convert PanelApp's current Ensembl annotation to a GenomicLocation"""
+    if not ensembl_data:
+        return None
+    
+    return GenomicLocation.model_construct(
+        ensembl_id=ensembl_data["ensembl_id"],
+        gene_symbol=ensembl_data["gene_symbol"],
+        chromosome=ensembl_data["chromosome"],
+        start=ensembl_data["start"],
+        end=ensembl_data["end"],
+        strand=ensembl_data["strand"]
+    )
+
+
+# =============================================================================
+# PIPELINE STEPS
+# =============================================================================
+
+def select_genes(panel_data: Dict[str, Any], request: Dict[str, Any]):
+    """Return the (genes, symbols) to analyze: all genes or up to max_genes"""
+    max_genes = request.get("max_genes")
+    genes = panel_data["genes"][:max_genes] if max_genes else panel_data["genes"]
+    return genes, [gene["symbol"] for gene in genes]
+
+
+async def fetch_gene_locations(genes: List[Dict[str, Any]], symbols: List[str], target_version: int):
+    """Return (current_data, target_data) location maps keyed by gene symbol"""
+    current_data = {
+        gene["symbol"]: current_location_from_panel(gene.get("current_ensembl_data"))
+        for gene in genes
+    }
+    target_data = await fetch_target_locations(target_version, symbols)
+    return current_data, target_data
+
+
+def compare_genes(
+    genes: List[Dict[str, Any]],
+    current_data: Dict[str, Optional[GenomicLocation]],
+    target_data: Dict[str, Optional[GenomicLocation]],
+    target_version: int
+) -> List[GeneComparisonRaw]:
+    """Compare each gene's current and target locations"""
+    comparisons = []
+    for gene in genes:
+        symbol = gene["symbol"]
+        confidence = gene["confidence"]
+        current_ensembl_data = gene.get("current_ensembl_data")
+        current_version_str = current_ensembl_data.get("version") if current_ensembl_data else None
+        
+        current_gene = current_data.get(symbol)
+        target_gene = target_data.get(symbol)
+        
+        comparison = compare_gene_data(
+            current_gene, 
+            target_gene, 
+            confidence,
+            current_version_str,
+            target_version
+        )
+        comparisons.append(comparison)
+    
+    return comparisons
+
+
+def summarize_comparisons(comparisons: List[GeneComparisonRaw]) -> AnalysisSummary:
+    """Calculate summary statistics for a set of comparisons"""
+    n = len(comparisons)
+    retained = np.fromiter((c.symbol_retained for c in comparisons), dtype=np.bool_, count=n)
+    location_changed = np.fromiter((c.location_changed for c in comparisons), dtype=np.bool_, count=n)
+    missing = np.fromiter((c.status == "missing" for c in comparisons), dtype=np.bool_, count=n)
+    
+    return AnalysisSummary(
+        symbols_retained=int(retained.sum()),
+        symbols_changed=int((~retained & ~missing).sum()),
+        locations_changed=int(location_changed.sum()),
+        genes_missing=int(missing.sum())
+    )
+
+
+async def run_panel_check(request: Dict[str, Any]) -> Dict[str, Any]:
+    """Run the panel check pipeline directly, without LangGraph orchestration"""
+    panel_data = await fetch_panel_genes_raw(request["panel_id"])
+    genes, symbols = select_genes(panel_data, request)
+    target_version = request["target_ensembl_version"]
+    
+    current_data, target_data = await fetch_gene_locations(genes, symbols, target_version)
+    comparisons = compare_genes(genes, current_data, target_data, target_version)
+    
+    return {
+        "panel_data": panel_data,
+        "comparison_results": comparisons,
+        "summary": summarize_comparisons(comparisons)
+    }
+
+
 # =============================================================================
 # AGENT FUNCTIONS
 # =============================================================================
@@ -565,103 +995,43 @@ async def panel_data_agent(state: PanelCheckState) -> PanelCheckState:
     request = state["panel_request"]
     panel_id = request["panel_id"]
     
-    # Fetch panel genes
-    panel_json = await fetch_panel_genes.ainvoke({"panel_id": panel_id})
-    panel_data = json.loads(panel_json)
+    panel_data = await fetch_panel_genes_raw(panel_id)
     
+    # Slice once here; later agents reuse the selected genes and symbols
     state["panel_data"] = panel_data
+    state["genes"], state["symbols"] = select_genes(panel_data, request)
     state["messages"].append(HumanMessage(content=f"Fetched {len(panel_data['genes'])} genes from panel {panel_id}"))
     
     return state
 
 
-async def current_ensembl_agent(state: PanelCheckState) -> PanelCheckState:
-    """Agent that extracts current Ensembl data from PanelApp"""
+async def ensembl_data_agent(state: PanelCheckState) -> PanelCheckState:
+    """Agent that gathers current (PanelApp) and target (Ensembl) gene data"""
     request = state["panel_request"]
-    panel_data = state["panel_data"]
-    
-    # Extract gene data (all genes or up to max_genes)
-    max_genes = request.get("max_genes")
-    genes = panel_data["genes"][:max_genes] if max_genes else panel_data["genes"]
     
-    current_data = {}
-    for gene in genes:
-        symbol = gene["symbol"]
-        ensembl_data = gene.get("current_ensembl_data")
-        
-        if ensembl_data:
-            # Convert to GenomicLocation
-            current_data[symbol] = GenomicLocation(
-                ensembl_id=ensembl_data["ensembl_id"],
-                gene_symbol=ensembl_data["gene_symbol"],
-                chromosome=ensembl_data["chromosome"],
-                start=ensembl_data["start"],
-                end=ensembl_data["end"],
-                strand=ensembl_data["strand"]
-            )
-        else:
-            current_data[symbol] = None
+    current_data, target_data = await fetch_gene_locations(
+        state["genes"],
+        state["symbols"],
+        request["target_ensembl_version"]
+    )
     
     state["current_ensembl_data"] = current_data
-    state["messages"].append(HumanMessage(content=f"Extracted current Ensembl data from PanelApp for {len(current_data)} genes"))
-    
-    return state
-
-
-async def target_ensembl_agent(state: PanelCheckState) -> PanelCheckState:
-    """Agent that fetches target Ensembl data"""
-    request = state["panel_request"]
-    panel_data = state["panel_data"]
-    target_version = request["target_ensembl_version"]
-    
-    client = EnsemblClient(version=target_version)
-    
-    # Fetch gene data (all genes or up to max_genes)
-    max_genes = request.get("max_genes")
-    genes = panel_data["genes"][:max_genes] if max_genes else panel_data["genes"]
-    
-    target_data = {}
-    for gene in genes:
-        symbol = gene["symbol"]
-        gene_data = await client.lookup_gene_by_symbol(symbol)
-        target_data[symbol] = gene_data
-    
     state["target_ensembl_data"] = target_data
-    state["messages"].append(HumanMessage(content=f"Fetched target Ensembl data for {len(target_data)} genes"))
+    state["messages"].append(HumanMessage(content=f"Fetched current and target Ensembl data for {len(target_data)} genes"))
     
     return state
 
 
 async def comparison_agent(state: PanelCheckState) -> PanelCheckState:
     """Agent that compares gene data between versions"""
-    panel_data = state["panel_data"]
-    current_data = state["current_ensembl_data"]
-    target_data = state["target_ensembl_data"]
     request = state["panel_request"]
     
-    # Compare all genes or up to max_genes
-    max_genes = request.get("max_genes")
-    genes = panel_data["genes"][:max_genes] if max_genes else panel_data["genes"]
-    target_version = request["target_ensembl_version"]
-    
-    comparisons = []
-    for gene in genes:
-        symbol = gene["symbol"]
-        confidence = gene["confidence"]
-        current_ensembl_data = gene.get("current_ensembl_data")
-        current_version_str = current_ensembl_data.get("version") if current_ensembl_data else None
-        
-        current_gene = current_data.get(symbol)
-        target_gene = target_data.get(symbol)
-        
-        comparison = compare_gene_data(
-            current_gene, 
-            target_gene, 
-            confidence,
-            current_version_str,
-            target_version
-        )
-        comparisons.append(comparison)
+    comparisons = compare_genes(
+        state["genes"],
+        state["current_ensembl_data"],
+        state["target_ensembl_data"],
+        request["target_ensembl_version"]
+    )
     
     state["comparison_results"] = comparisons
     state["messages"].append(HumanMessage(content=f"Compared {len(comparisons)} genes"))
@@ -671,20 +1041,7 @@ async def comparison_agent(state: PanelCheckState) -> PanelCheckState:
 
 async def synthesis_agent(state: PanelCheckState) -> PanelCheckState:
     """Agent that synthesizes final report"""
-    comparisons = state["comparison_results"]
-    
-    # Calculate summary statistics
-    symbols_retained = sum(1 for c in comparisons if c.symbol_retained)
-    symbols_changed = sum(1 for c in comparisons if not c.symbol_retained and c.status != "missing")
-    locations_changed = sum(1 for c in comparisons if c.location_changed)
-    genes_missing = sum(1 for c in comparisons if c.status == "missing")
-    
-    summary = AnalysisSummary(
-        symbols_retained=symbols_retained,
-        symbols_changed=symbols_changed,
-        locations_changed=locations_changed,
-        genes_missing=genes_missing
-    )
+    summary = summarize_comparisons(state["comparison_results"])
     
     state["final_report"] = summary.model_dump_json()
     state["messages"].append(HumanMessage(content="Analysis complete"))
@@ -702,27 +1059,60 @@ def build_panel_check_graph():
     
     # Add nodes
     g.add_node("panel_data", panel_data_agent)
-    g.add_node("current_ensembl", current_ensembl_agent)
-    g.add_node("target_ensembl", target_ensembl_agent)
+    g.add_node("ensembl_fetch", ensembl_data_agent)
     g.add_node("comparison", comparison_agent)
     g.add_node("synthesis", synthesis_agent)
     
     # Sequential workflow to avoid concurrent state updates
     g.add_edge(START, "panel_data")
-    g.add_edge("panel_data", "current_ensembl")
-    g.add_edge("current_ensembl", "target_ensembl")
-    g.add_edge("target_ensembl", "comparison")
+    g.add_edge("panel_data", "ensembl_fetch")
+    g.add_edge("ensembl_fetch", "comparison")
     g.add_edge("comparison", "synthesis")
     g.add_edge("synthesis", END)
     
     return g.compile()
 
 
+# Compiled graphs are immutable, so one instance can serve every request
+_PANEL_CHECK_GRAPH = build_panel_check_graph()
+
+
+async def run_panel_check_graph(request: Dict[str, Any]) -> Dict[str, Any]:
+    """Run the panel check through the LangGraph workflow (for tracing demos)"""
+    initial_state = {
+        "messages": [],
+        "panel_request": request,
+        "panel_data": None,
+        "genes": None,
+        "symbols": None,
+        "current_ensembl_data": None,
+        "target_ensembl_data": None,
+        "comparison_results": None,
+        "final_report": None,
+        "tool_calls": []
+    }
+    
+    result = await _PANEL_CHECK_GRAPH.ainvoke(initial_state)
+    
+    return {
+        "panel_data": result["panel_data"],
+        "comparison_results": result["comparison_results"],
+        "summary": AnalysisSummary.model_validate_json(result["final_report"])
+    }
+
+
 # =============================================================================
 # FASTAPI APPLICATION
 # =============================================================================
 
-app = FastAPI(title="PanelChecker API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Release pooled API connections on shutdown"""
+    yield
+    await close_http_clients()
+
+
+app = FastAPI(title="PanelChecker API", version="1.0.0", lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -733,9 +1123,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize tracing if available
-if _TRACING:
+def _init_tracing():
+    """Register Arize/OpenInference instrumentation (optional)"""
     try:
+        from arize.otel import register
+        from openinference.instrumentation.langchain import LangChainInstrumentor
+        from openinference.instrumentation.litellm import LiteLLMInstrumentor
+        
         space_id = os.getenv("ARIZE_SPACE_ID")
         api_key = os.getenv("ARIZE_API_KEY")
         if space_id and api_key:
@@ -746,6 +1140,11 @@ if _TRACING:
         print(f"Tracing initialization failed: {e}")
 
 
+# Tracing is opt-in so the request path skips span creation by default
+if os.getenv("ENABLE_TRACING"):
+    _init_tracing()
+
+
 # =============================================================================
 # API ENDPOINTS
 # =============================================================================
@@ -784,27 +1183,13 @@ async def search_panels(search: Optional[str] = None, signed_off_only: bool = Tr
 async def analyze_panel(request: PanelAnalysisRequest):
     """Analyze a panel by comparing genes across Ensembl versions"""
     try:
-        # Build and execute graph
-        graph = build_panel_check_graph()
-        
-        initial_state = {
-            "messages": [],
-            "panel_request": request.model_dump(),
-            "panel_data": None,
-            "current_ensembl_data": None,
-            "target_ensembl_data": None,
-            "comparison_results": None,
-            "final_report": None,
-            "tool_calls": []
-        }
-        
-        result = await graph.ainvoke(initial_state)
+        if USE_LANGGRAPH:
+            result = await run_panel_check_graph(request.model_dump())
+        else:
+            result = await run_panel_check(request.model_dump())
         
-        # Extract results
         panel_data = result["panel_data"]
         comparisons = result["comparison_results"]
-        summary_json = result["final_report"]
-        summary = AnalysisSummary.model_validate_json(summary_json)
         
         # Calculate totals
         total_genes = len(panel_data["genes"])
@@ -815,8 +1200,8 @@ async def analyze_panel(request: PanelAnalysisRequest):
             panel_name=panel_data["panel_name"],
             total_genes=total_genes,
             genes_analyzed=genes_analyzed,
-            summary=summary,
-            genes=comparisons
+            summary=result["summary"],
+            genes=[comparison.to_model() for comparison in comparisons]
         )
         
     except Exception as e:
@@ -830,91 +1215,91 @@ class CSVExportRequest(BaseModel):
     review_priorities: Dict[str, str] = Field(default_factory=dict, description="Gene symbol to review priority mapping")
 
 
+CSV_HEADER = [
+    "Gene Symbol", "Confidence", "Review Priority", "Symbol Retained", "Location Changed",
+    "Ensembl ID Retained", "Status",
+    "Current Ensembl ID", "Current Chromosome", "Current Start", "Current End", "Current Strand", "Current Version",
+    "Target Ensembl ID", "Target Chromosome", "Target Start", "Target End", "Target Strand"
+]
+
+# Genes compared per streamed chunk of the CSV export
+CSV_STREAM_CHUNK_SIZE = 200
+
+
+def csv_escape(value: Any) -> str:
+    """Quote a CSV field the way csv.writer's default dialect does"""
+    text = str(value)
+    if any(ch in text for ch in ',"\r\n'):
+        return '"' + text.replace('"', '""') + '"'
+    return text
+
+
+def csv_line(values: List[Any]) -> str:
+    """Format one CSV record"""
+    return ",".join(csv_escape(value) for value in values) + "\r\n"
+
+
+async def analyze_panel_stream(genes: List[Dict[str, Any]], target_version: int):
+    """Yield (gene, comparison) pairs, fetching target data one chunk at a time"""
+    symbols = [gene["symbol"] for gene in genes]
+    for i in range(0, len(genes), CSV_STREAM_CHUNK_SIZE):
+        chunk = genes[i:i + CSV_STREAM_CHUNK_SIZE]
+        current_data, target_data = await fetch_gene_locations(chunk, symbols[i:i + CSV_STREAM_CHUNK_SIZE], target_version)
+        for gene, comparison in zip(chunk, compare_genes(chunk, current_data, target_data, target_version)):
+            yield gene, comparison
+
+
+def csv_row(gene: Dict[str, Any], comparison: GeneComparisonRaw, review_priority: str) -> List[Any]:
+    """Build the CSV export row for one compared gene"""
+    ensembl_data = gene.get("current_ensembl_data")
+    current_version_display = ensembl_data.get("version", "N/A") if ensembl_data else "N/A"
+    current = comparison.current_version
+    target = comparison.target_version
+    
+    return [
+        comparison.gene_symbol,
+        comparison.confidence,
+        review_priority,
+        "Yes" if comparison.symbol_retained else "No",
+        "Yes" if comparison.location_changed else "No",
+        "Yes" if comparison.ensembl_id_retained else "No",
+        comparison.status.upper(),
+        current.ensembl_id if current else "N/A",
+        current.chromosome if current else "N/A",
+        current.start if current else "N/A",
+        current.end if current else "N/A",
+        current.strand if current else "N/A",
+        current_version_display,
+        target.ensembl_id if target else "N/A",
+        target.chromosome if target else "N/A",
+        target.start if target else "N/A",
+        target.end if target else "N/A",
+        target.strand if target else "N/A"
+    ]
+
+
 @app.post("/api/export-panel-csv")
 async def export_panel_csv(request: CSVExportRequest):
     """Export panel analysis results to CSV including review priorities"""
     try:
-        # Fetch all panel genes
-        client = PanelAppClient()
-        panel_data_json = await fetch_panel_genes.ainvoke({"panel_id": request.panel_id})
-        panel_data = json.loads(panel_data_json)
-        
-        # Fetch target Ensembl data
-        target_client = EnsemblClient(version=request.target_version)
-        
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Write header (added Review Priority column)
-        writer.writerow([
-            "Gene Symbol", "Confidence", "Review Priority", "Symbol Retained", "Location Changed",
-            "Ensembl ID Retained", "Status",
-            "Current Ensembl ID", "Current Chromosome", "Current Start", "Current End", "Current Strand", "Current Version",
-            "Target Ensembl ID", "Target Chromosome", "Target Start", "Target End", "Target Strand"
-        ])
-        
-        # Process each gene
-        for gene in panel_data["genes"]:
-            symbol = gene["symbol"]
-            confidence = gene["confidence"]
-            ensembl_data = gene.get("current_ensembl_data")
-            
-            # Get current data from PanelApp
-            current_gene = None
-            if ensembl_data:
-                current_gene = GenomicLocation(
-                    ensembl_id=ensembl_data["ensembl_id"],
-                    gene_symbol=ensembl_data["gene_symbol"],
-                    chromosome=ensembl_data["chromosome"],
-                    start=ensembl_data["start"],
-                    end=ensembl_data["end"],
-                    strand=ensembl_data["strand"]
-                )
-            
-            # Fetch target data from Ensembl
-            target_gene = await target_client.lookup_gene_by_symbol(symbol)
-            
-            # Compare
-            current_version_number = ensembl_data.get("version") if ensembl_data else None
-            comparison = compare_gene_data(current_gene, target_gene, confidence, current_version_number, request.target_version)
-            
-            # Get review priority
-            review_priority = request.review_priorities.get(symbol, "Not Set")
-            
-            # Write row (added review_priority)
-            current_version_display = ensembl_data.get("version", "N/A") if ensembl_data else "N/A"
-            writer.writerow([
-                comparison.gene_symbol,
-                comparison.confidence,
-                review_priority,
-                "Yes" if comparison.symbol_retained else "No",
-                "Yes" if comparison.location_changed else "No",
-                "Yes" if comparison.ensembl_id_retained else "No",
-                comparison.status.upper(),
-                comparison.current_version.ensembl_id if comparison.current_version else "N/A",
-                comparison.current_version.chromosome if comparison.current_version else "N/A",
-                comparison.current_version.start if comparison.current_version else "N/A",
-                comparison.current_version.end if comparison.current_version else "N/A",
-                comparison.current_version.strand if comparison.current_version else "N/A",
-                current_version_display,
-                comparison.target_version.ensembl_id if comparison.target_version else "N/A",
-                comparison.target_version.chromosome if comparison.target_version else "N/A",
-                comparison.target_version.start if comparison.target_version else "N/A",
-                comparison.target_version.end if comparison.target_version else "N/A",
-                comparison.target_version.strand if comparison.target_version else "N/A"
-            ])
-        
-        output.seek(0)
-        filename = f"PanelChecker_{request.panel_id}_to_v{request.target_version}_{datetime.now().strftime('%Y%m%d')}.csv"
-        
-        return StreamingResponse(
-            iter([output.getvalue()]),
-            media_type="text/csv",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
-        )
-        
+        # Fetch all panel genes up front so PanelApp errors still return a 500
+        panel_data = await fetch_panel_genes_raw(request.panel_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error exporting CSV: {str(e)}")
+    
+    async def row_iter():
+        yield csv_line(CSV_HEADER)
+        async for gene, comparison in analyze_panel_stream(panel_data["genes"], request.target_version):
+            review_priority = request.review_priorities.get(gene["symbol"], "Not Set")
+            yield csv_line(csv_row(gene, comparison, review_priority))
+    
+    filename = f"PanelChecker_{request.panel_id}_to_v{request.target_version}_{datetime.now().strftime('%Y%m%d')}.csv"
+    
+    return StreamingResponse(
+        row_iter(),
+        media_type="text/csv",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
 
 
 if __name__ == "__main__":